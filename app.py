@@ -1,21 +1,119 @@
 import os
 import logging
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
 from flask import (
     Flask, render_template, request,
-    jsonify
+    jsonify, Response
 )
 from pdf_processor import PDFProcessor
-from question_answering import QuestionAnswering
+from question_answering import QuestionAnswering, embed_text
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def fast_jsonify(**kwargs) -> Response:
+    """jsonify drop-in backed by orjson's native encoder when available"""
+    if orjson is None:
+        return jsonify(**kwargs)
+    return Response(orjson.dumps(kwargs), mimetype='application/json')
 
 # ─── Flask Setup ───────────────────────────────────────────────────────────────
 logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
-# ─── In-Memory Globals ─────────────────────────────────────────────────────────
-pdf_processor   = None
-qa_system       = None
-current_pdf_url = None
+
+# ─── Semantic Response Cache ───────────────────────────────────────────────────
+class SemanticCache:
+    """Caches answers keyed by question embedding so repeated or paraphrased
+    questions skip the QA pipeline entirely"""
+
+    def __init__(self, threshold: float = 0.87, max_size: int = 1024):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.embeddings = None  # (n, d) normalized float32 matrix
+        self.results = []
+
+    def lookup(self, question, question_vec=None):
+        """Return the cached result for a semantically similar question, or None"""
+        if np is None or self.embeddings is None or not len(self.results):
+            return None
+        q = question_vec if question_vec is not None else embed_text(question)
+        if q is None:
+            return None
+        sims = self.embeddings @ q
+        best = int(np.argmax(sims))
+        if float(sims[best]) >= self.threshold:
+            return self.results[best]
+        return None
+
+    def store(self, question, result, question_vec=None):
+        """Add a question/result pair, evicting the oldest entry when full"""
+        if np is None:
+            return
+        q = question_vec if question_vec is not None else embed_text(question)
+        if q is None:
+            return
+        if self.embeddings is None:
+            self.embeddings = q[np.newaxis, :]
+            self.results = [result]
+        else:
+            self.embeddings = np.vstack([self.embeddings, q])
+            self.results.append(result)
+        if len(self.results) > self.max_size:
+            self.embeddings = self.embeddings[1:]
+            self.results = self.results[1:]
+
+    def clear(self):
+        self.embeddings = None
+        self.results = []
+
+
+# ─── Server-Side PDF Sessions ──────────────────────────────────────────────────
+# Heavy state (pages, embeddings, index, caches) stays in-process; only a
+# UUID travels in the cookie, so per-request serialization is O(36) bytes
+SESSION_COOKIE = 'qa_session_id'
+_MAX_SESSIONS  = 32
+
+
+class PDFSession:
+    """Per-user state for one uploaded PDF"""
+
+    def __init__(self, processor, qa_system, pdf_url):
+        self.processor    = processor
+        self.qa_system    = qa_system
+        self.pdf_url      = pdf_url
+        self.answer_cache = SemanticCache()
+
+
+sessions: OrderedDict = OrderedDict()  # session_id -> PDFSession (LRU)
+_sessions_lock = threading.Lock()      # guards lookups against concurrent eviction
+
+
+def _session_id() -> str:
+    return request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+
+def _current_session():
+    sid = request.cookies.get(SESSION_COOKIE)
+    if not sid:
+        return None
+    with _sessions_lock:
+        pdf_session = sessions.get(sid)
+        if pdf_session is not None:
+            sessions.move_to_end(sid)
+        return pdf_session
 
 # ─── Routes ────────────────────────────────────────────────────────────────────
 @app.route('/')
@@ -25,64 +123,87 @@ def index():
 
 @app.route('/upload_pdf', methods=['POST'])
 def upload_pdf():
-    global pdf_processor, qa_system, current_pdf_url
-
     data    = request.get_json(silent=True) or {}
     pdf_url = (data.get('pdf_url') or '').strip()
 
     if not pdf_url:
-        return jsonify(success=False, error="PDF URL is required"), 400
+        return fast_jsonify(success=False, error="PDF URL is required"), 400
 
     if 'firebase' not in pdf_url.lower() and 'googleapis.com' not in pdf_url.lower():
-        return jsonify(success=False, error="Invalid Firebase Storage URL"), 400
+        return fast_jsonify(success=False, error="Invalid Firebase Storage URL"), 400
 
     logging.info(f"Downloading & processing PDF from {pdf_url}")
     processor = PDFProcessor()
     pages = processor.download_and_process_pdf(pdf_url)
     if not pages:
-        return jsonify(success=False, error="Failed to extract text from PDF"), 500
+        return fast_jsonify(success=False, error="Failed to extract text from PDF"), 500
 
-    # store in globals
-    pdf_processor   = processor
-    qa_system       = QuestionAnswering(pages)
-    current_pdf_url = pdf_url
+    # persist the ANN index keyed by content hash so re-uploads skip the rebuild
+    index_path = None
+    if processor.content_hash:
+        index_path = os.path.join(
+            tempfile.gettempdir(), f"hrqa_index_{processor.content_hash}.bin"
+        )
+
+    # store server-side, keyed by the session cookie
+    sid = _session_id()
+    qa_system = QuestionAnswering(
+        pages, index_path=index_path, content_hash=processor.content_hash
+    )
+    with _sessions_lock:
+        sessions[sid] = PDFSession(processor, qa_system, pdf_url)
+        sessions.move_to_end(sid)
+        while len(sessions) > _MAX_SESSIONS:
+            sessions.popitem(last=False)
     total = len(pages)
 
     logging.info(f"Loaded {total} pages")
-    return jsonify(
+    response = fast_jsonify(
         success=True,
         message=f"PDF processed successfully! {total} pages loaded.",
         total_pages=total
     )
+    response.set_cookie(SESSION_COOKIE, sid, httponly=True)
+    return response
 
 
 @app.route('/ask_question', methods=['POST'])
 def ask_question():
-    global qa_system, current_pdf_url
-
     data     = request.get_json(silent=True) or {}
     question = (data.get('question') or '').strip()
 
     if not question:
-        return jsonify(success=False, error="Question is required"), 400
-
-    if qa_system is None:
-        return jsonify(success=False, error="Please upload a PDF first"), 400
-
-    logging.info(f"Answering: {question!r}")
-    result = qa_system.find_answer(question)
+        return fast_jsonify(success=False, error="Question is required"), 400
+
+    pdf_session = _current_session()
+    if pdf_session is None:
+        return fast_jsonify(success=False, error="Please upload a PDF first"), 400
+
+    # Embed once; the cache lookup, the QA search and the cache store all
+    # reuse the same vector
+    question_vec = embed_text(question)
+
+    cached = pdf_session.answer_cache.lookup(question, question_vec)
+    if cached is not None:
+        logging.info(f"Semantic cache hit for: {question!r}")
+        result = cached
+    else:
+        logging.info(f"Answering: {question!r}")
+        result = pdf_session.qa_system.find_answer(question, question_vec)
+        if result:
+            pdf_session.answer_cache.store(question, result, question_vec)
 
     if not result:
-        return jsonify(
+        return fast_jsonify(
             success=True,
             answer="No relevant answer found in the PDF.",
             page_number=None,
             confidence=0,
-            pdf_link=current_pdf_url
+            pdf_link=pdf_session.pdf_url
         )
 
-    page_link = f"{current_pdf_url}#page={result['page_number']}"
-    return jsonify(
+    page_link = f"{pdf_session.pdf_url}#page={result['page_number']}"
+    return fast_jsonify(
         success=True,
         answer=result['answer'],
         page_number=result['page_number'],
@@ -94,15 +215,19 @@ def ask_question():
 @app.route('/status')
 def status():
     """Called on page load to see if a PDF has already been uploaded."""
-    loaded = qa_system is not None
-    total  = len(pdf_processor.get_pages_data()) if loaded else 0
-    return jsonify(
+    pdf_session = _current_session()
+    loaded = pdf_session is not None
+    total  = len(pdf_session.processor.get_pages_data()) if loaded else 0
+    return fast_jsonify(
         pdf_loaded=loaded,
         total_pages=total,
-        pdf_url=current_pdf_url or ""
+        pdf_url=pdf_session.pdf_url if loaded else ""
     )
 
 
 # ─── Start App ─────────────────────────────────────────────────────────────────
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # threaded=True lets /ask_question proceed while another request blocks
+    # on a PDF download; in production run threaded gunicorn workers instead:
+    #   gunicorn --bind 0.0.0.0:5000 --threads 8 main:app
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
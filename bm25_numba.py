@@ -0,0 +1,100 @@
+import logging
+from typing import Dict, List
+
+try:
+    import numpy as np
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # BM25 scoring is optional; callers fall back to the Python loop
+    np = None
+    NUMBA_AVAILABLE = False
+
+# Standard BM25 parameters
+K1 = 1.5
+B = 0.75
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def _score_sentences(q_tokens, tokens_flat, offsets, idf, avgdl):
+        """BM25-score every sentence against the query token IDs in parallel"""
+        num_sentences = offsets.shape[0] - 1
+        scores = np.zeros(num_sentences, dtype=np.float64)
+
+        for i in prange(num_sentences):
+            start = offsets[i]
+            end = offsets[i + 1]
+            doc_len = end - start
+            norm = K1 * (1.0 - B + B * doc_len / avgdl)
+
+            score = 0.0
+            for j in range(q_tokens.shape[0]):
+                token = q_tokens[j]
+                tf = 0
+                for k in range(start, end):
+                    if tokens_flat[k] == token:
+                        tf += 1
+                if tf > 0:
+                    score += idf[token] * (tf * (K1 + 1.0)) / (tf + norm)
+
+            scores[i] = score
+
+        return scores
+
+
+class BM25Index:
+    """BM25 index over pre-tokenized sentences.
+
+    Sentences are stored as a single flat int32 token-ID array plus offsets
+    so the scoring kernel runs as native parallel loops instead of Python
+    per-keyword substring tests.
+    """
+
+    def __init__(self, tokenized_sentences: List[List[str]]):
+        self.vocab: Dict[str, int] = {}
+        self.num_sentences = len(tokenized_sentences)
+
+        token_ids = []
+        offsets = [0]
+        for tokens in tokenized_sentences:
+            for token in tokens:
+                token_id = self.vocab.setdefault(token, len(self.vocab))
+                token_ids.append(token_id)
+            offsets.append(len(token_ids))
+
+        self.tokens_flat = np.array(token_ids, dtype=np.int32)
+        self.offsets = np.array(offsets, dtype=np.int64)
+
+        lengths = np.diff(self.offsets)
+        self.avgdl = float(lengths.mean()) if self.num_sentences else 1.0
+
+        # Document frequency per token -> IDF
+        doc_freq = np.zeros(len(self.vocab), dtype=np.int64)
+        for i in range(self.num_sentences):
+            sentence_ids = np.unique(self.tokens_flat[self.offsets[i]:self.offsets[i + 1]])
+            doc_freq[sentence_ids] += 1
+
+        n = max(self.num_sentences, 1)
+        self.idf = np.log(1.0 + (n - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        logging.debug(f"BM25 index: {self.num_sentences} sentences, {len(self.vocab)} terms")
+
+    def _query_ids(self, query_tokens: List[str]):
+        return np.array(
+            [self.vocab[t] for t in query_tokens if t in self.vocab],
+            dtype=np.int32
+        )
+
+    def score(self, query_tokens: List[str]):
+        """Return a BM25 score per sentence for the given query tokens"""
+        q_ids = self._query_ids(query_tokens)
+        if not len(q_ids):
+            return np.zeros(self.num_sentences, dtype=np.float64)
+        return _score_sentences(q_ids, self.tokens_flat, self.offsets, self.idf, self.avgdl)
+
+    def max_score(self, query_tokens: List[str]) -> float:
+        """Upper bound on the score (tf -> inf limit), used to normalize to [0, 1)"""
+        q_ids = self._query_ids(query_tokens)
+        if not len(q_ids):
+            return 0.0
+        return float((self.idf[q_ids] * (K1 + 1.0)).sum())
@@ -1,64 +1,258 @@
+import hashlib
+import io
 import requests
 import fitz  # PyMuPDF
 import logging
+import os
 import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import httpx
+except ImportError:  # fall back to a pooled requests session (HTTP/1.1)
+    httpx = None
+
+_UA_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# One pooled client per process; a client per PDFProcessor instance would
+# discard the warm connection on every upload
+if httpx is not None:
+    _CLIENT = httpx.Client(http2=True, timeout=30, headers=_UA_HEADERS,
+                           follow_redirects=True)
+    _REQUEST_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    _CLIENT = requests.Session()
+    _CLIENT.headers.update(_UA_HEADERS)
+    _REQUEST_ERRORS = (requests.exceptions.RequestException,)
+
+# Precompiled cleaning patterns: the artifact class collapses runs into a
+# single space, so the whitespace collapse is the only pass that sees them.
+# \w must stay Unicode-aware (no re.ASCII) so accented text survives cleaning,
+# matching QuestionAnswering's preprocessing
+_ARTIFACT_RE = re.compile(r'[^\w\s\.,!?;:()\-"\']+')
+_WS_RE = re.compile(r'\s+')
+
+# Below this page count the thread-pool overhead outweighs the parallelism
+_MIN_PARALLEL_PAGES = 8
+
+# LRU of parsed pages keyed by (url, etag/last-modified) so re-uploading an
+# unchanged PDF skips both the download and the extraction
+_PAGES_CACHE: OrderedDict = OrderedDict()  # key -> (pages, blocks, content_hash)
+_PAGES_CACHE_SIZE = 16
+
+# Last seen (etag, last_modified) per URL, sent back as conditional headers
+# so an unchanged PDF costs a ~1KB 304 instead of a full download
+_VALIDATORS: Dict[str, tuple] = {}
+
+# Guards _PAGES_CACHE and _VALIDATORS against concurrent request threads
+_cache_lock = threading.Lock()
+
 
 class PDFProcessor:
     """Handles PDF downloading and text extraction"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-    
-    def download_and_extract_text(self, pdf_url: str) -> Optional[List[str]]:
+        self.session = _CLIENT
+        self.pages_data: List[str] = []
+        self.content_hash: Optional[str] = None
+
+        # SoA block storage: parallel arrays instead of per-block objects
+        self.blocks_text: List[str] = []
+        self.blocks_page = None  # int32 array, 1-indexed page per block
+        self.blocks_bbox = None  # float32 (N, 4) array of (x0, y0, x1, y1)
+
+    def download_and_process_pdf(self, pdf_url: str) -> Optional[List[str]]:
         """
         Download PDF from URL and extract text from each page
-        
+
         Args:
             pdf_url: URL to the PDF file
-            
+
         Returns:
             List of strings, each containing text from one page
         """
         try:
-            # Download PDF
+            # Send the last seen validator so an unchanged PDF costs a 304
+            conditional = {}
+            with _cache_lock:
+                validator = _VALIDATORS.get(pdf_url)
+            if validator:
+                etag, last_modified = validator
+                if etag:
+                    conditional['If-None-Match'] = etag
+                if last_modified:
+                    conditional['If-Modified-Since'] = last_modified
+
             logging.info(f"Downloading PDF from: {pdf_url}")
-            response = self.session.get(pdf_url, timeout=30)
-            response.raise_for_status()
-            
-            if response.headers.get('content-type', '').lower() != 'application/pdf':
-                logging.warning(f"Content type is not PDF: {response.headers.get('content-type')}")
-            
-            # Extract text using PyMuPDF
-            pdf_document = fitz.open(stream=response.content, filetype="pdf")
-            pages_text = []
-            
-            for page_num in range(len(pdf_document)):
-                page = pdf_document.load_page(page_num)
-                text = page.get_text()
-                
-                # Clean and normalize text
-                cleaned_text = self._clean_text(text)
-                pages_text.append(cleaned_text)
-                
-                logging.debug(f"Page {page_num + 1}: {len(cleaned_text)} characters")
-            
-            pdf_document.close()
-            
+            status, headers, pdf_bytes = self._fetch_pdf(pdf_url, conditional)
+
+            if status == 304:
+                cache_key = (pdf_url, validator)
+                with _cache_lock:
+                    cached = _PAGES_CACHE.get(cache_key)
+                    if cached is not None:
+                        _PAGES_CACHE.move_to_end(cache_key)
+                if cached is not None:
+                    self.pages_data, blocks, self.content_hash = cached
+                    self.blocks_text, self.blocks_page, self.blocks_bbox = blocks
+                    logging.info(f"Not modified; reusing {len(self.pages_data)} cached pages")
+                    return self.pages_data
+                # Validator matched but the parsed pages were evicted
+                status, headers, pdf_bytes = self._fetch_pdf(pdf_url, {})
+
+            self.content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+            pages_text = self._extract_pages(pdf_bytes)
+
+            self.pages_data = pages_text
+            new_validator = (headers.get('etag'), headers.get('last-modified'))
+            if any(new_validator):
+                blocks = (self.blocks_text, self.blocks_page, self.blocks_bbox)
+                with _cache_lock:
+                    _VALIDATORS[pdf_url] = new_validator
+                    _PAGES_CACHE[(pdf_url, new_validator)] = (pages_text, blocks, self.content_hash)
+                    while len(_PAGES_CACHE) > _PAGES_CACHE_SIZE:
+                        _PAGES_CACHE.popitem(last=False)
             logging.info(f"Successfully extracted text from {len(pages_text)} pages")
             return pages_text
-            
-        except requests.exceptions.RequestException as e:
+
+        except _REQUEST_ERRORS as e:
             logging.error(f"Error downloading PDF: {str(e)}")
             raise Exception(f"Failed to download PDF: {str(e)}")
-        
+
         except Exception as e:
             logging.error(f"Error processing PDF: {str(e)}")
             raise Exception(f"Failed to process PDF: {str(e)}")
+
+    def get_pages_data(self) -> List[str]:
+        """Return the cleaned per-page text from the last processed PDF"""
+        return self.pages_data
+
+    def get_blocks_data(self) -> Tuple[List[str], object, object]:
+        """Return the SoA block arrays: (texts, page numbers, bounding boxes)"""
+        return self.blocks_text, self.blocks_page, self.blocks_bbox
+
+    def _fetch_pdf(self, pdf_url: str, extra_headers: Dict) -> Tuple:
+        """
+        Stream the PDF into memory through the shared pooled client
+
+        Returns:
+            (status_code, response headers, pdf bytes or None on 304)
+        """
+        buffer = io.BytesIO()
+
+        if httpx is not None:
+            with self.session.stream('GET', pdf_url, headers=extra_headers) as response:
+                if response.status_code == 304:
+                    return 304, response.headers, None
+                response.raise_for_status()
+                self._warn_content_type(response.headers)
+                for chunk in response.iter_bytes(chunk_size=1 << 20):
+                    buffer.write(chunk)
+        else:
+            with self.session.get(pdf_url, stream=True, timeout=30,
+                                  headers=extra_headers) as response:
+                if response.status_code == 304:
+                    return 304, response.headers, None
+                response.raise_for_status()
+                self._warn_content_type(response.headers)
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, buffer, length=1 << 20)
+
+        pdf_bytes = buffer.getvalue()
+        buffer.close()
+        return 200, response.headers, pdf_bytes
+
+    @staticmethod
+    def _warn_content_type(headers):
+        if headers.get('content-type', '').lower() != 'application/pdf':
+            logging.warning(f"Content type is not PDF: {headers.get('content-type')}")
+
+    def _extract_pages(self, pdf_bytes) -> List[str]:
+        """
+        Extract and clean text blocks from every page, in parallel for
+        large PDFs, and store them in SoA form
+
+        PyMuPDF Document objects are not thread-safe, so each worker opens
+        its own view over the shared immutable PDF bytes and extracts a
+        contiguous slice of pages; get_text releases the GIL in C code,
+        giving real parallelism.
+        """
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+            page_count = pdf_document.page_count
+
+            max_workers = min(os.cpu_count() or 1, page_count)
+            if page_count < _MIN_PARALLEL_PAGES or max_workers < 2:
+                pages_blocks = [self._page_blocks(pdf_document.load_page(i))
+                                for i in range(page_count)]
+                return self._store_blocks(pages_blocks)
+
+        # Split the page range into one contiguous chunk per worker
+        chunk_size = -(-page_count // max_workers)  # ceil division
+        ranges = [(start, min(start + chunk_size, page_count))
+                  for start in range(0, page_count, chunk_size)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            chunks = executor.map(
+                lambda bounds: self._extract_range(pdf_bytes, *bounds),
+                ranges
+            )
+
+        return self._store_blocks([page for chunk in chunks for page in chunk])
+
+    def _extract_range(self, pdf_bytes, start: int, stop: int) -> List[List[Tuple]]:
+        """Extract block lists for a contiguous range of pages in a private
+        document view"""
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+            return [self._page_blocks(pdf_document.load_page(i))
+                    for i in range(start, stop)]
+
+    def _page_blocks(self, page) -> List[Tuple]:
+        """Extract one page's text blocks as (bbox, cleaned_text) tuples"""
+        blocks = []
+        for x0, y0, x1, y1, text, _block_no, block_type in page.get_text("blocks"):
+            if block_type != 0:  # skip image blocks
+                continue
+            cleaned = self._clean_text(text)
+            if cleaned:
+                blocks.append(((x0, y0, x1, y1), cleaned))
+        return blocks
+
+    def _store_blocks(self, pages_blocks: List[List[Tuple]]) -> List[str]:
+        """Flatten per-page block lists into parallel SoA arrays and
+        return the joined per-page text"""
+        blocks_text = []
+        blocks_page = []
+        blocks_bbox = []
+        pages_text = []
+
+        for page_idx, blocks in enumerate(pages_blocks):
+            for bbox, text in blocks:
+                blocks_text.append(text)
+                blocks_page.append(page_idx + 1)  # 1-indexed
+                blocks_bbox.append(bbox)
+            pages_text.append(' '.join(text for _, text in blocks))
+
+        self.blocks_text = blocks_text
+        if np is not None:
+            self.blocks_page = np.array(blocks_page, dtype=np.int32)
+            self.blocks_bbox = np.array(blocks_bbox, dtype=np.float32).reshape(-1, 4)
+        else:
+            self.blocks_page = blocks_page
+            self.blocks_bbox = blocks_bbox
+
+        return pages_text
     
     def _clean_text(self, text: str) -> str:
         """
@@ -72,20 +266,10 @@ class PDFProcessor:
         """
         if not text:
             return ""
-        
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove common PDF artifacts
-        text = re.sub(r'[^\w\s\.,!?;:()\-"\']', ' ', text)
-        
-        # Normalize line breaks
-        text = text.replace('\n', ' ').replace('\r', ' ')
-        
-        # Remove extra spaces
-        text = ' '.join(text.split())
-        
-        return text.strip()
+
+        # Strip artifacts, then collapse all whitespace (including line
+        # breaks) in a single pass each over the string
+        return _WS_RE.sub(' ', _ARTIFACT_RE.sub(' ', text)).strip()
     
     def validate_firebase_url(self, url: str) -> bool:
         """
@@ -130,6 +314,7 @@ class PDFProcessor:
                 'content_length': response.headers.get('content-length'),
                 'content_type': response.headers.get('content-type'),
                 'last_modified': response.headers.get('last-modified'),
+                'etag': response.headers.get('etag'),
                 'url': pdf_url
             }
             
@@ -1,146 +1,547 @@
+import bisect
 import difflib
 import logging
+import os
+import queue
 import re
+import threading
+import time
+from concurrent.futures import Future
 from typing import List, Dict, Optional, Tuple
 
-class QuestionAnswering:
-    """Handles question answering using fuzzy text matching"""
-    
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # semantic search is optional; fall back to fuzzy matching
+    SentenceTransformer = None
+
+try:
+    import hnswlib
+except ImportError:  # ANN index is optional; fall back to brute-force cosine scan
+    hnswlib = None
+
+try:
+    import hyperscan
+except ImportError:  # multi-pattern scanning is optional; fall back to 'in' tests
+    hyperscan = None
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:  # fall back to the pure-Python matcher
+    fuzz = None
+
+try:
+    from scipy.sparse import csr_matrix
+except ImportError:  # vectorized keyword counting is optional
+    csr_matrix = None
+
+import bm25_numba
+import vector_store
+
+# Common stop words filtered out of question keywords; hoisted so the set
+# is built once at import instead of on every call
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'what', 'how', 'when', 'where', 'why', 'who',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has',
+    'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'may', 'might', 'can', 'shall', 'this', 'that', 'these', 'those'
+})
+
+# Shared across instances so the model is only loaded once per process
+_EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+_embedding_model = None
+_model_lock = threading.Lock()
+
+
+def _get_embedding_model():
+    """Lazily load the shared sentence-transformer model (or None if unavailable)"""
+    global _embedding_model
+    if SentenceTransformer is None:
+        return None
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                logging.info(f"Loading embedding model: {_EMBEDDING_MODEL_NAME}")
+                _embedding_model = SentenceTransformer(_EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+
+class _EncodeBatcher:
+    """Coalesces concurrent single-text encode calls into batched
+    model.encode calls.
+
+    Under threaded serving, each request would otherwise pay the full
+    per-call model overhead for a batch of one. A background worker drains
+    up to _BATCH_MAX pending texts within a _BATCH_WINDOW of the first
+    arrival and encodes them in a single call; callers block on a Future
+    for their own row.
+    """
+
+    _BATCH_WINDOW = 0.01  # seconds to wait for co-arriving requests
+    _BATCH_MAX = 32
+
     def __init__(self):
-        self.min_confidence = 0.1  # Minimum confidence threshold
-        self.context_window = 200  # Characters around the match to include
-    
-    def answer_question(self, question: str, pdf_pages: List[str]) -> Optional[Dict]:
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def encode(self, text: str):
+        """Encode one text, transparently sharing a batch with concurrent callers"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name='encode-batcher', daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._BATCH_WINDOW
+            while len(batch) < self._BATCH_MAX:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = _get_embedding_model().encode(
+                    [text for text, _ in batch],
+                    normalize_embeddings=True
+                ).astype(np.float32)
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+_encode_batcher = _EncodeBatcher()
+
+
+def embed_text(text: str):
+    """Embed a piece of text as a normalized float32 vector (None if unavailable)"""
+    if _get_embedding_model() is None:
+        return None
+    return _encode_batcher.encode(text)
+
+
+class QuestionAnswering:
+    """Answers questions against PDF pages using semantic embedding search,
+    with fuzzy keyword matching as a fallback when embeddings are unavailable"""
+
+    def __init__(self, pages: List[str], index_path: Optional[str] = None,
+                 content_hash: Optional[str] = None):
+        self.pages = pages
+        self.min_confidence = 0.1       # Minimum confidence threshold (fuzzy path)
+        self.min_similarity = 0.25      # Minimum cosine similarity (semantic path)
+        self.context_window = 200       # Characters around the match to include
+        self.top_k = 5                  # Candidates to consider per question
+
+        # Segment each page into sentences once at ingest
+        self.sentences: List[str] = []
+        self.sentence_pages: List[int] = []  # sentence index -> page number (1-indexed)
+        for page_num, page_text in enumerate(pages):
+            for sentence in re.split(r'[.!?]+', page_text):
+                sentence = sentence.strip()
+                if sentence:
+                    self.sentences.append(sentence)
+                    self.sentence_pages.append(page_num + 1)
+
+        # Embed all sentences up front so each question is a single matmul,
+        # then quantize to int8 so storage drops 4x (the float matrix is
+        # only needed transiently to build the index)
+        self.embeddings_i8 = None
+        self.embedding_scales = None
+        self.index = None
+        model = _get_embedding_model()
+        if model is not None and self.sentences:
+            # A document seen before (same content hash) loads its stored
+            # embeddings from disk instead of re-running the model
+            embeddings = None
+            store = vector_store.get_store()
+            if store is not None and content_hash:
+                stored = store.load(content_hash)
+                if stored is not None:
+                    self.sentences, self.sentence_pages, embeddings = stored
+                    logging.info(f"Loaded {len(self.sentences)} stored sentence embeddings")
+
+            if embeddings is None:
+                logging.info(f"Embedding {len(self.sentences)} sentences")
+                embeddings = model.encode(
+                    self.sentences,
+                    batch_size=64,
+                    normalize_embeddings=True
+                ).astype(np.float32)
+                if store is not None and content_hash:
+                    store.save(content_hash, self.sentences,
+                               self.sentence_pages, embeddings)
+
+            # Build an HNSW index for sub-linear nearest-neighbour search
+            if hnswlib is not None:
+                self.index = self._build_index(embeddings, index_path)
+
+            # Symmetric per-vector quantization: x ~= x_i8 * scale
+            scales = np.abs(embeddings).max(axis=1, keepdims=True) / 127.0
+            np.maximum(scales, 1e-12, out=scales)
+            self.embeddings_i8 = np.round(embeddings / scales).astype(np.int8)
+            self.embedding_scales = scales.astype(np.float32)
+
+        # Without embeddings, keyword search is the live path: tokenize the
+        # sentences once so questions are scored by the native BM25 kernel
+        self.bm25 = None
+        if self.embeddings_i8 is None and bm25_numba.NUMBA_AVAILABLE and self.sentences:
+            tokenized = [self._preprocess_text(s).split() for s in self.sentences]
+            self.bm25 = bm25_numba.BM25Index(tokenized)
+
+        # Preprocess and sentence-split the static page text once so each
+        # question reads cached data instead of redoing the regex passes
+        self._processed_pages: List[str] = []
+        self._sentences_per_page: List[List[str]] = []
+        if self.embeddings_i8 is None:
+            self._processed_pages = [self._preprocess_text(p) for p in pages]
+            self._sentences_per_page = [re.split(r'[.!?]+', pp)
+                                        for pp in self._processed_pages]
+
+        # Binary token-membership CSR matrix over all sentences so keyword
+        # counting becomes one sparse column-slice sum instead of a loop
+        self._vocab = None
+        self._token_matrix = None
+        self._page_row_offsets = None
+        if csr_matrix is not None and self._sentences_per_page:
+            self._build_token_matrix()
+
+        # Compiled hyperscan database for the current question's keywords
+        self._hs_cache = None
+
+    def _build_index(self, embeddings, index_path: Optional[str]):
+        """Build (or load from disk) an HNSW index over the sentence embeddings"""
+        try:
+            num_elements, dim = embeddings.shape
+            index = hnswlib.Index(space='cosine', dim=dim)
+
+            if index_path and os.path.exists(index_path):
+                logging.info(f"Loading HNSW index from {index_path}")
+                index.load_index(index_path, max_elements=num_elements)
+            else:
+                index.init_index(max_elements=num_elements, ef_construction=200, M=16)
+                index.add_items(embeddings, np.arange(num_elements))
+                if index_path:
+                    index.save_index(index_path)
+                    logging.info(f"Saved HNSW index to {index_path}")
+
+            index.set_ef(50)
+            return index
+
+        except Exception as e:
+            logging.error(f"Error building HNSW index: {str(e)}")
+            return None
+
+    def find_answer(self, question: str, question_vec=None) -> Optional[Dict]:
         """
         Find the best answer to a question in the PDF pages
-        
+
         Args:
             question: User's question
-            pdf_pages: List of text from each PDF page
-            
+            question_vec: Optional precomputed embedding of the question,
+                          to avoid re-encoding when the caller already has it
+
         Returns:
             Dictionary with answer, page number, confidence, and excerpt
         """
+        if self.embeddings_i8 is not None:
+            return self._semantic_answer(question, question_vec)
+        if self.bm25 is not None:
+            return self._bm25_answer(question)
+        return self._fuzzy_answer(question)
+
+    def _bm25_answer(self, question: str) -> Optional[Dict]:
+        """Answer by BM25-ranking all sentences with the Numba kernel"""
+        try:
+            processed_question = self._preprocess_text(question)
+            keywords = self._extract_keywords(processed_question)
+            if not keywords:
+                return None
+
+            scores = self.bm25.score(keywords)
+            best_idx = int(np.argmax(scores))
+
+            # Normalize against the best attainable score for this query
+            max_score = self.bm25.max_score(keywords)
+            confidence = float(scores[best_idx]) / max_score if max_score > 0 else 0.0
+
+            if confidence < self.min_confidence:
+                logging.info(f"No good match found. Best confidence: {confidence:.3f}")
+                return None
+
+            sentence = self.sentences[best_idx]
+            page_number = self.sentence_pages[best_idx]
+            excerpt = self._create_excerpt(sentence, self.pages[page_number - 1])
+
+            result = {
+                'answer': self._format_answer(sentence),
+                'page_number': page_number,
+                'confidence': round(confidence, 3),
+                'excerpt': excerpt,
+                'question': question
+            }
+
+            logging.info(f"Found answer with confidence {confidence:.3f} on page {page_number}")
+            return result
+
+        except Exception as e:
+            logging.error(f"Error in BM25 answering: {str(e)}")
+            return None
+
+    def _semantic_answer(self, question: str, question_vec=None) -> Optional[Dict]:
+        """Answer by cosine-ranking the question embedding against stored vectors"""
+        try:
+            # Batched with concurrent requests' encodes where possible
+            q_vec = question_vec if question_vec is not None else embed_text(question)
+
+            k = min(self.top_k, len(self.sentences))
+            if self.index is not None:
+                # O(log N) graph traversal instead of a full cosine scan
+                labels, distances = self.index.knn_query(q_vec[np.newaxis, :], k=k)
+                best_idx = int(labels[0][0])
+                best_score = 1.0 - float(distances[0][0])
+            else:
+                # Single GEMM over the int8 matrix; rescaling the int32 dot
+                # products recovers the cosine since embeddings are normalized
+                q_scale = max(float(np.abs(q_vec).max()) / 127.0, 1e-12)
+                q_i8 = np.round(q_vec / q_scale).astype(np.int8)
+                dots = self.embeddings_i8.astype(np.int32) @ q_i8.astype(np.int32)
+                scores = dots * (self.embedding_scales[:, 0] * q_scale)
+                top_idx = np.argpartition(scores, -k)[-k:]
+                best_idx = int(top_idx[np.argmax(scores[top_idx])])
+                best_score = float(scores[best_idx])
+
+            if best_score < self.min_similarity:
+                logging.info(f"No good match found. Best similarity: {best_score:.3f}")
+                return None
+
+            sentence = self.sentences[best_idx]
+            page_number = self.sentence_pages[best_idx]
+            excerpt = self._create_excerpt(sentence, self.pages[page_number - 1])
+
+            result = {
+                'answer': self._format_answer(sentence),
+                'page_number': page_number,
+                'confidence': round(best_score, 3),
+                'excerpt': excerpt,
+                'question': question
+            }
+
+            logging.info(f"Found answer with similarity {best_score:.3f} on page {page_number}")
+            return result
+
+        except Exception as e:
+            logging.error(f"Error in semantic answering: {str(e)}")
+            return None
+
+    def _fuzzy_answer(self, question: str) -> Optional[Dict]:
+        """Fallback: fuzzy keyword matching over the raw page text"""
         try:
             # Preprocess question
             processed_question = self._preprocess_text(question)
             question_keywords = self._extract_keywords(processed_question)
-            
+
             logging.info(f"Processing question: {question}")
             logging.info(f"Extracted keywords: {question_keywords}")
-            
+
             best_match = None
             best_confidence = 0
             best_page = 0
             best_excerpt = ""
-            
+
             # Search through each page
-            for page_num, page_text in enumerate(pdf_pages):
+            for page_idx, page_text in enumerate(self.pages):
                 if not page_text.strip():
                     continue
-                
+
                 # Find matches on this page
-                matches = self._find_matches(question_keywords, page_text)
-                
+                matches = self._find_matches(question_keywords, page_idx)
+
                 for match in matches:
                     confidence = self._calculate_confidence(
-                        processed_question, 
-                        match['text'], 
+                        processed_question,
+                        match['text'],
                         question_keywords
                     )
-                    
+
                     if confidence > best_confidence:
                         best_confidence = confidence
-                        best_page = page_num + 1  # 1-indexed
+                        best_page = page_idx + 1  # 1-indexed
                         best_excerpt = match['excerpt']
                         best_match = match
-            
+
             # Check if we found a good enough match
             if best_confidence < self.min_confidence:
                 logging.info(f"No good match found. Best confidence: {best_confidence}")
                 return None
-            
-            # Generate answer
-            answer = self._generate_answer(best_match, processed_question)
-            
+
             result = {
-                'answer': answer,
+                'answer': self._format_answer(best_match['text']),
                 'page_number': best_page,
                 'confidence': round(best_confidence, 3),
                 'excerpt': best_excerpt,
                 'question': question
             }
-            
+
             logging.info(f"Found answer with confidence {best_confidence:.3f} on page {best_page}")
             return result
-            
+
         except Exception as e:
             logging.error(f"Error in question answering: {str(e)}")
             return None
-    
+
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text for better matching"""
         # Convert to lowercase
         text = text.lower()
-        
+
         # Remove punctuation and extra whitespace
         text = re.sub(r'[^\w\s]', ' ', text)
         text = re.sub(r'\s+', ' ', text)
-        
+
         return text.strip()
-    
+
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract meaningful keywords from text"""
-        # Common stop words to filter out
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'what', 'how', 'when', 'where', 'why', 'who',
-            'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has',
-            'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-            'may', 'might', 'can', 'shall', 'this', 'that', 'these', 'those'
-        }
-        
-        words = text.split()
-        
         # Filter out stop words and short words
-        keywords = [word for word in words 
-                   if len(word) > 2 and word not in stop_words]
-        
-        return keywords
-    
-    def _find_matches(self, keywords: List[str], page_text: str) -> List[Dict]:
-        """Find potential matches in page text"""
+        return [word for word in text.split()
+                if len(word) > 2 and word not in _STOP_WORDS]
+
+    def _find_matches(self, keywords: List[str], page_idx: int) -> List[Dict]:
+        """Find potential matches in the preprocessed text of one page"""
         matches = []
-        processed_text = self._preprocess_text(page_text)
-        
-        # Split text into sentences
-        sentences = re.split(r'[.!?]+', processed_text)
-        
+        page_text = self.pages[page_idx]
+        sentences = self._sentences_per_page[page_idx]
+
+        # Count keyword matches per sentence in one pass over the page
+        keyword_counts = self._keyword_counts(keywords, sentences, page_idx)
+
         for i, sentence in enumerate(sentences):
             if not sentence.strip():
                 continue
-            
-            # Count keyword matches in sentence
-            keyword_count = sum(1 for keyword in keywords if keyword in sentence)
-            
+
+            keyword_count = keyword_counts[i]
+
             if keyword_count > 0:
                 # Get surrounding context
                 start_idx = max(0, i - 1)
                 end_idx = min(len(sentences), i + 2)
                 context_sentences = sentences[start_idx:end_idx]
-                
+
                 # Create excerpt from original text
                 excerpt = self._create_excerpt(sentence, page_text)
-                
+
                 matches.append({
                     'text': sentence,
                     'excerpt': excerpt,
                     'keyword_count': keyword_count,
                     'context': ' '.join(context_sentences)
                 })
-        
+
         return matches
-    
+
+    def _build_token_matrix(self):
+        """Build the sentence x vocab CSR membership matrix and per-page row
+        offsets (sentences are rows, in page order)"""
+        vocab: Dict[str, int] = {}
+        indices = []
+        indptr = [0]
+        row_offsets = [0]
+
+        for sentences in self._sentences_per_page:
+            for sentence in sentences:
+                for token in set(sentence.split()):  # binary membership
+                    indices.append(vocab.setdefault(token, len(vocab)))
+                indptr.append(len(indices))
+            row_offsets.append(len(indptr) - 1)
+
+        self._vocab = vocab
+        self._token_matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(indptr) - 1, max(len(vocab), 1))
+        )
+        self._page_row_offsets = row_offsets
+
+    def _keyword_counts(self, keywords: List[str], sentences: List[str],
+                        page_idx: Optional[int] = None) -> List[int]:
+        """Count distinct keyword hits per sentence"""
+        if self._token_matrix is not None and page_idx is not None and keywords:
+            q_ids = [self._vocab[k] for k in keywords if k in self._vocab]
+            if not q_ids:
+                return [0] * len(sentences)
+            start = self._page_row_offsets[page_idx]
+            stop = self._page_row_offsets[page_idx + 1]
+            counts = self._token_matrix[start:stop, q_ids].sum(axis=1)
+            return np.asarray(counts).ravel().tolist()
+
+        if hyperscan is not None and keywords:
+            try:
+                return self._keyword_counts_hyperscan(keywords, sentences)
+            except Exception as e:
+                logging.debug(f"Hyperscan scan failed, using substring tests: {str(e)}")
+
+        return [sum(1 for keyword in keywords if keyword in sentence)
+                for sentence in sentences]
+
+    def _keyword_counts_hyperscan(self, keywords: List[str], sentences: List[str]) -> List[int]:
+        """Scan all keywords over the page in a single hyperscan pass,
+        then bucket the match offsets into sentences"""
+        # Byte offsets of each sentence within the joined page text
+        sentence_bytes = [s.encode() for s in sentences]
+        page_bytes = b' '.join(sentence_bytes)
+        starts = []
+        pos = 0
+        for sb in sentence_bytes:
+            starts.append(pos)
+            pos += len(sb) + 1
+
+        hits = [set() for _ in sentences]
+
+        def on_match(keyword_id, from_, to, flags, context):
+            sentence_idx = bisect.bisect_right(starts, to - 1) - 1
+            hits[sentence_idx].add(keyword_id)
+
+        db = self._hyperscan_db(keywords)
+        db.scan(page_bytes, match_event_handler=on_match)
+
+        return [len(h) for h in hits]
+
+    def _hyperscan_db(self, keywords: List[str]):
+        """Compile (and cache) a hyperscan database for the question's keywords"""
+        key = tuple(keywords)
+        if self._hs_cache is not None and self._hs_cache[0] == key:
+            return self._hs_cache[1]
+
+        db = hyperscan.Database()
+        # Keywords are preprocessed to word characters only, so they are
+        # safe to compile as literal patterns
+        db.compile(
+            expressions=[keyword.encode() for keyword in keywords],
+            ids=list(range(len(keywords))),
+            flags=[hyperscan.HS_FLAG_CASELESS] * len(keywords)
+        )
+        self._hs_cache = (key, db)
+        return db
+
     def _calculate_confidence(self, question: str, answer_text: str, keywords: List[str]) -> float:
         """Calculate confidence score for a match"""
         # Keyword overlap score
@@ -148,67 +549,68 @@ class QuestionAnswering:
         for keyword in keywords:
             if keyword in answer_text:
                 keyword_score += 1
-        
+
         keyword_ratio = keyword_score / len(keywords) if keywords else 0
-        
-        # Similarity score using difflib
-        similarity = difflib.SequenceMatcher(None, question, answer_text).ratio()
-        
+
+        # Similarity score: RapidFuzz's C++ bit-parallel ratio when available,
+        # difflib's pure-Python matcher otherwise
+        if fuzz is not None:
+            similarity = fuzz.ratio(question, answer_text) / 100.0
+        else:
+            similarity = difflib.SequenceMatcher(None, question, answer_text).ratio()
+
         # Length penalty for very short matches
         length_penalty = min(1.0, len(answer_text) / 50)
-        
+
         # Combined confidence score
         confidence = (keyword_ratio * 0.5 + similarity * 0.3 + length_penalty * 0.2)
-        
+
         return confidence
-    
+
     def _create_excerpt(self, sentence: str, full_text: str) -> str:
         """Create a contextual excerpt around the matched sentence"""
         # Find the sentence in the original text
         sentence_clean = sentence.strip()
-        
+
         # Simple approach: find similar text and get context
         words = sentence_clean.split()[:5]  # First 5 words
         search_phrase = ' '.join(words)
-        
+
         # Find in original text (case insensitive)
         text_lower = full_text.lower()
         search_lower = search_phrase.lower()
-        
+
         pos = text_lower.find(search_lower)
-        
+
         if pos == -1:
             # Fallback to just the sentence
             return sentence[:200] + "..." if len(sentence) > 200 else sentence
-        
+
         # Get context around the match
         start = max(0, pos - self.context_window)
         end = min(len(full_text), pos + len(search_phrase) + self.context_window)
-        
+
         excerpt = full_text[start:end].strip()
-        
+
         # Add ellipsis if truncated
         if start > 0:
             excerpt = "..." + excerpt
         if end < len(full_text):
             excerpt = excerpt + "..."
-        
+
         return excerpt
-    
-    def _generate_answer(self, match: Dict, question: str) -> str:
-        """Generate a natural language answer"""
-        # Simple answer generation based on the match
-        answer_text = match['text']
-        
+
+    def _format_answer(self, answer_text: str) -> str:
+        """Format a matched sentence as a natural language answer"""
         # Clean up the answer
         answer_text = answer_text.strip()
-        
+
         # Capitalize first letter
         if answer_text:
             answer_text = answer_text[0].upper() + answer_text[1:]
-        
+
         # Ensure it ends with punctuation
         if answer_text and answer_text[-1] not in '.!?':
             answer_text += '.'
-        
+
         return answer_text
@@ -0,0 +1,144 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+    import sqlite_vec
+    SQLITE_VEC_AVAILABLE = True
+except ImportError:  # persistence is optional; embeddings are recomputed
+    np = None
+    sqlite_vec = None
+    SQLITE_VEC_AVAILABLE = False
+
+_DB_PATH = os.environ.get(
+    'HRQA_VECTOR_DB',
+    os.path.join(tempfile.gettempdir(), 'hrqa_vectors.db')
+)
+
+_store = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional['VectorStore']:
+    """Return the shared VectorStore, or None if sqlite-vec is unavailable"""
+    global _store, _store_failed
+    if not SQLITE_VEC_AVAILABLE or _store_failed:
+        return None
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = VectorStore()
+            except Exception as e:
+                logging.error(f"Could not open vector store: {str(e)}")
+                _store_failed = True
+    return _store
+
+
+class VectorStore:
+    """Disk-backed sentence/embedding store keyed by PDF content hash.
+
+    Rows persist across restarts, so re-ingesting a known document loads
+    its sentences and embeddings from SQLite instead of re-running the
+    model; the vec0 virtual table is partitioned by document hash so
+    multiple PDFs coexist in one database.
+    """
+
+    def __init__(self, db_path: str = _DB_PATH, dim: int = 384):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.enable_load_extension(True)
+        sqlite_vec.load(self.conn)
+        self.conn.enable_load_extension(False)
+
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS docs (
+                sha TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS sentences (
+                id INTEGER PRIMARY KEY,
+                sha TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                sentence TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sentences_sha ON sentences(sha);
+            CREATE VIRTUAL TABLE IF NOT EXISTS vec_sent USING vec0(
+                doc_sha TEXT PARTITION KEY,
+                embedding FLOAT[{dim}]
+            );
+        """)
+        self.conn.commit()
+
+    def has(self, sha: str) -> bool:
+        """True if this document's embeddings are already stored"""
+        row = self.conn.execute("SELECT 1 FROM docs WHERE sha = ?", (sha,)).fetchone()
+        return row is not None
+
+    def save(self, sha: str, sentences: List[str], sentence_pages: List[int],
+             embeddings) -> None:
+        """Persist a document's sentences and their embeddings"""
+        with self._lock:
+            if self.has(sha):
+                return
+            cursor = self.conn.cursor()
+            for sentence, page, vector in zip(sentences, sentence_pages, embeddings):
+                cursor.execute(
+                    "INSERT INTO sentences (sha, page, sentence) VALUES (?, ?, ?)",
+                    (sha, page, sentence)
+                )
+                cursor.execute(
+                    "INSERT INTO vec_sent (rowid, doc_sha, embedding) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, sha, sqlite_vec.serialize_float32(vector))
+                )
+            cursor.execute("INSERT INTO docs (sha) VALUES (?)", (sha,))
+            self.conn.commit()
+        logging.info(f"Persisted {len(sentences)} sentence embeddings for {sha[:12]}")
+
+    def load(self, sha: str) -> Optional[Tuple[List[str], List[int], object]]:
+        """
+        Load a stored document
+
+        Returns:
+            (sentences, sentence page numbers, float32 embedding matrix),
+            or None if the document is not stored
+        """
+        if not self.has(sha):
+            return None
+
+        rows = self.conn.execute(
+            """
+            SELECT s.sentence, s.page, v.embedding
+            FROM sentences s JOIN vec_sent v ON v.rowid = s.id
+            WHERE s.sha = ?
+            ORDER BY s.id
+            """,
+            (sha,)
+        ).fetchall()
+        if not rows:
+            return None
+
+        sentences = [row[0] for row in rows]
+        pages = [row[1] for row in rows]
+        embeddings = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        return sentences, pages, embeddings
+
+    def query(self, sha: str, q_vec, k: int = 5) -> List[Tuple[int, str, int, float]]:
+        """KNN search within one document, executed by sqlite-vec in C
+
+        Returns:
+            List of (sentence id, sentence, page number, cosine distance)
+        """
+        return self.conn.execute(
+            """
+            SELECT v.rowid, s.sentence, s.page, v.distance
+            FROM vec_sent v JOIN sentences s ON s.id = v.rowid
+            WHERE v.doc_sha = ? AND v.embedding MATCH ? AND v.k = ?
+            ORDER BY v.distance
+            """,
+            (sha, sqlite_vec.serialize_float32(q_vec), k)
+        ).fetchall()